@@ -3,6 +3,39 @@ import click
 import subprocess
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; generate_codes falls back to pure Python
+    np = None
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:  # Pillow is optional; targets fall back to ImageMagick
+    Image = ImageDraw = None
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+
+    def _popcount(val):
+        return bin(val).count("1")
+
+
+# Number of candidates evaluated per array by the NumPy path of
+# generate_codes; bounds memory use and lets max_codes stop the search early
+_CODES_CHUNK_SIZE = 1 << 16
+
+# Smallest candidate space, 1 << (bits - 2), for which generate_codes uses
+# Numba; below it, importing Numba and compiling the loop cost more than the
+# loop itself
+_NUMBA_MIN_CANDIDATES = 1 << 24
+
+# Number of targets drawn by each magick process when Pillow is not
+# installed; bounded so the command line stays within OS limits
+_MAGICK_BATCH_SIZE = 32
 
 
 def bitwise_rotate_left(val, bits, total_bits):
@@ -17,26 +50,29 @@ def bitwise_rotate_left(val, bits, total_bits):
     Returns:
     int: The result of the bitwise rotation.
     """
-    return (val << bits) & (2**total_bits - 1) | (
-        (val & (2**total_bits - 1)) >> total_bits - bits
-    )
+    full_mask = (1 << total_bits) - 1
+    return (val << bits) & full_mask | ((val & full_mask) >> total_bits - bits)
 
 
-def find_smallest_rotation(val, total_bits):
+def find_smallest_rotation(val, total_bits, full_mask=None):
     """
     Find the smallest representation of a value through bitwise rotations.
 
     Parameters:
     val (int): The value to find the smallest rotation for.
     total_bits (int): The total number of bits in the value.
+    full_mask (int, optional): Precomputed (1 << total_bits) - 1. Default is None.
 
     Returns:
     int: The smallest rotated value.
     """
-    smallest = val
-    for i in range(1, total_bits):
-        smallest = min(bitwise_rotate_left(val, i, total_bits), smallest)
-    return smallest
+    if full_mask is None:
+        full_mask = (1 << total_bits) - 1
+    # Every rotation of val is a total_bits wide window of val concatenated
+    # with itself
+    val &= full_mask
+    doubled = (val << total_bits) | val
+    return min((doubled >> i) & full_mask for i in range(total_bits))
 
 
 def calc_parity(val):
@@ -49,11 +85,7 @@ def calc_parity(val):
     Returns:
     bool: True if even parity, False otherwise.
     """
-    parity = True
-    while val:
-        parity = not parity
-        val = val & (val - 1)
-    return parity
+    return not (_popcount(val) & 1)
 
 
 def count_bit_transitions(val):
@@ -66,15 +98,9 @@ def count_bit_transitions(val):
     Returns:
     int: The number of bit transitions.
     """
-    transitions = 0
-    prev_bit = 0
-    while val:
-        new_bit = val & 1
-        if new_bit > prev_bit:
-            transitions += 1
-        prev_bit = new_bit
-        val >>= 1
-    return transitions
+    # A 0 -> 1 transition (scanning from the LSB, starting from 0) occurs at
+    # every set bit whose lower neighbour is clear
+    return _popcount(val & ~(val << 1))
 
 
 def generate_codes(bits, transitions=None, max_codes=None):
@@ -89,20 +115,41 @@ def generate_codes(bits, transitions=None, max_codes=None):
     Returns:
     list: A list of unique generated codes.
     """
+    return list(_generate_codes_cached(bits, transitions, max_codes))
+
+
+@lru_cache(maxsize=32)
+def _generate_codes_cached(bits, transitions, max_codes):
+    # generate_codes() is a pure function of its arguments, so memoize it;
+    # results are kept as tuples so callers cannot modify the cached copy
+    if np is not None and bits <= 62 and 1 << (bits - 2) >= _NUMBA_MIN_CANDIDATES:
+        fill_codes = _numba_fill_codes()
+        if fill_codes is not None:
+            return tuple(
+                _generate_codes_numba(fill_codes, bits, transitions, max_codes)
+            )
+    if np is not None and bits <= 64:
+        return tuple(_generate_codes_numpy(bits, transitions, max_codes))
+
     codes = []
+    half_bits = bits >> 1
+    low_mask = (1 << half_bits) - 1
+    high_mask = low_mask << half_bits
+    full_mask = (1 << bits) - 1
+
     # Codes all start with 0 and end with 1, allowing us to check fewer numbers
-    for i in range(2 ** (bits - 2)):
+    for i in range(1 << (bits - 2)):
         # Add 1 bit to end
         code = (i << 1) + 1
 
-        # Perform cyclic shift to minimize value
-        code = find_smallest_rotation(code, bits)
+        # Only keep codes that are already their own smallest cyclic shift;
+        # every other rotation of the same code is visited at its own i,
+        # so this also guarantees the codes are unique
+        if find_smallest_rotation(code, bits, full_mask) != code:
+            continue
 
         # Check which pairs of opposite segments are both 1
-        half_bits = bits >> 1
-        diff = (code & (2**half_bits - 1)) & (
-            (code & ((2**half_bits - 1) << half_bits)) >> half_bits
-        )
+        diff = (code & low_mask) & ((code & high_mask) >> half_bits)
 
         # Find parity
         parity = calc_parity(code)
@@ -110,22 +157,164 @@ def generate_codes(bits, transitions=None, max_codes=None):
         # Count number of transitions
         num_transitions = count_bit_transitions(code) if transitions else None
 
-        # Find unique codes with even parity and at least one pair of opposite
+        # Find codes with even parity and at least one pair of opposite
         # segments that are both 1 (and correct number of transitions,
         # if applicable)
         if (
             parity
             and diff > 0
             and (transitions is None or num_transitions == transitions)
-            and code not in codes
         ):
             codes.append(code)
             if max_codes is not None and len(codes) >= max_codes:
                 break
 
+    return tuple(codes)
+
+
+def _generate_codes_numpy(bits, transitions=None, max_codes=None):
+    # Vectorized equivalent of the loop in generate_codes(); candidates are
+    # evaluated a chunk at a time so memory stays bounded and the search can
+    # stop once max_codes are found
+    one = np.uint64(1)
+    half_bits = np.uint64(bits >> 1)
+    low_mask = np.uint64((1 << (bits >> 1)) - 1)
+    full_mask = np.uint64((1 << bits) - 1)
+
+    # The Python loop always keeps the first code before checking max_codes
+    limit = None if max_codes is None else max(max_codes, 1)
+
+    codes = []
+    num_candidates = 1 << (bits - 2)
+    for start in range(0, num_candidates, _CODES_CHUNK_SIZE):
+        stop = min(start + _CODES_CHUNK_SIZE, num_candidates)
+
+        # Codes all start with 0 and end with 1, allowing us to check fewer numbers
+        code = (np.arange(start, stop, dtype=np.uint64) << one) | one
+
+        # Only keep codes that are already their own smallest cyclic shift
+        smallest = code.copy()
+        for k in range(1, bits):
+            rotated = ((code << np.uint64(k)) & full_mask) | (
+                code >> np.uint64(bits - k)
+            )
+            np.minimum(smallest, rotated, out=smallest)
+        valid = code == smallest
+
+        # At least one pair of opposite segments that are both 1
+        valid &= (code & low_mask & (code >> half_bits)) != 0
+
+        # Even parity
+        valid &= (_bitwise_count(code) & 1) == 0
+
+        # Correct number of transitions, if applicable
+        if transitions is not None:
+            valid &= _bitwise_count(code & ~(code << one)) == transitions
+
+        codes.extend(code[valid].tolist())
+        if limit is not None and len(codes) >= limit:
+            return codes[:limit]
+
+    return codes
+
+
+def _bitwise_count(arr):
+    # Per-element popcount of a uint64 array; np.bitwise_count needs NumPy 2.0
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(arr)
+    as_bytes = np.ascontiguousarray(arr, dtype=np.uint64).view(np.uint8)
+    return np.unpackbits(as_bytes.reshape(-1, 8), axis=1).sum(axis=1)
+
+
+@lru_cache(maxsize=None)
+def _numba_fill_codes():
+    # Import Numba and JIT-compile _fill_codes() on first use only, returning
+    # None if Numba is not installed
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    return njit(cache=True)(_fill_codes)
+
+
+def _generate_codes_numba(fill_codes, bits, transitions=None, max_codes=None):
+    # Run the loop in generate_codes() as JIT-compiled native code, collecting
+    # the codes through a bounded buffer
+    # The Python loop always keeps the first code before checking max_codes
+    limit = None if max_codes is None else max(max_codes, 1)
+    out = np.empty(
+        _CODES_CHUNK_SIZE if limit is None else min(limit, _CODES_CHUNK_SIZE),
+        dtype=np.int64,
+    )
+
+    codes = []
+    start = 0
+    num_candidates = 1 << (bits - 2)
+    while start < num_candidates:
+        count, start = fill_codes(
+            bits, start, transitions is not None, transitions or 0, out
+        )
+        codes.extend(out[:count].tolist())
+        if limit is not None and len(codes) >= limit:
+            return codes[:limit]
+
     return codes
 
 
+def _fill_codes(bits, start, check_transitions, transitions, out):
+    # Write the codes accepted by generate_codes(), from candidate start
+    # onwards, into out until it is full; returns how many were written and
+    # the candidate to resume from. Compiled with Numba by _numba_fill_codes()
+    half_bits = bits >> 1
+    low_mask = (1 << half_bits) - 1
+    full_mask = (1 << bits) - 1
+    num_candidates = 1 << (bits - 2)
+    count = 0
+
+    i = start
+    while i < num_candidates and count < len(out):
+        # Codes all start with 0 and end with 1, allowing us to check fewer numbers
+        code = (i << 1) | 1
+        i += 1
+
+        # Only keep codes that are already their own smallest cyclic shift
+        canonical = True
+        for k in range(1, bits):
+            if ((code << k) & full_mask) | (code >> (bits - k)) < code:
+                canonical = False
+                break
+        if not canonical:
+            continue
+
+        # At least one pair of opposite segments that are both 1
+        if code & low_mask & (code >> half_bits) == 0:
+            continue
+
+        # Even parity
+        ones = 0
+        val = code
+        while val:
+            val &= val - 1
+            ones += 1
+        if ones & 1:
+            continue
+
+        # Correct number of transitions, if applicable
+        if check_transitions:
+            num_transitions = 0
+            val = code & ~(code << 1)
+            while val:
+                val &= val - 1
+                num_transitions += 1
+            if num_transitions != transitions:
+                continue
+
+        out[count] = code
+        count += 1
+
+    return count, i
+
+
 def angle_to_coordinates(angle, radius, center):
     """
     Convert polar coordinates to Cartesian coordinates.
@@ -143,6 +332,28 @@ def angle_to_coordinates(angle, radius, center):
     return (int(x), int(y))
 
 
+def _set_segments(code, bits):
+    # Yield the indices of the segments whose bit is set, visiting only the
+    # set bits; segment 0 is the most significant bit
+    remaining = code & ((1 << bits) - 1)
+    while remaining:
+        top = remaining.bit_length() - 1
+        remaining ^= 1 << top
+        yield bits - 1 - top
+
+
+@lru_cache(maxsize=None)
+def _segment_boundaries(bits, center, radius_outer):
+    # Segment boundaries only fall on multiples of 360 / bits and are the same
+    # for every code, so compute the outer arc end points once per target
+    # geometry rather than per segment
+    angle_per_segment = 360 / bits
+    return tuple(
+        angle_to_coordinates(k * angle_per_segment, radius_outer, center)
+        for k in range(bits + 1)
+    )
+
+
 def generate_arc_commands(code, bits, center, radius_outer):
     """
     Generate ImageMagick commands for drawing arcs based on the code.
@@ -154,25 +365,115 @@ def generate_arc_commands(code, bits, center, radius_outer):
     radius_outer (float): The radius of the outer circle.
 
     Returns:
-    str: ImageMagick commands for drawing arcs.
+    list: ImageMagick arguments for drawing arcs.
+    """
+    segments = []
+    boundaries = _segment_boundaries(bits, center, radius_outer)
+
+    for i in _set_segments(code, bits):
+        # Start and end points for the outer arc
+        start_outer = boundaries[i]
+        end_outer = boundaries[i + 1]
+
+        # Construct the arc sub-path
+        # Note: This assumes clockwise drawing; adjust as necessary
+        segment = f"M {center[0]},{center[1]} L {start_outer[0]},{start_outer[1]} A {radius_outer},{radius_outer} 0 0,1 {end_outer[0]},{end_outer[1]} Z"
+        segments.append(segment)
+
+    if not segments:
+        return []
+
+    # Draw all segments with a single path so ImageMagick only parses and
+    # sets up one draw primitive per code
+    return ["-fill", "white", "-draw", f"path '{' '.join(segments)}'"]
+
+
+def draw_target(code, bits, center, radius_outer, radii, size, filename):
+    """
+    Draw a target for the code with Pillow and save it as a PNG file.
+
+    Parameters:
+    code (int): The code to draw.
+    bits (int): The number of bits used for encoding.
+    center (tuple): The center point as a tuple (x, y).
+    radius_outer (float): The radius of the arc segments.
+    radii (tuple): The radii of the outer black, outer white, inner black and
+        inner dot circles.
+    size (tuple): The image size as a tuple (width, height).
+    filename (str): The PNG file to write.
     """
-    commands = []
+    radius_outer_black, radius_outer_white, radius_inner_black, radius_inner_dot = radii
+
+    def bounding_box(radius):
+        return [
+            center[0] - radius,
+            center[1] - radius,
+            center[0] + radius,
+            center[1] + radius,
+        ]
+
+    image = Image.new("L", size, "white")
+    draw = ImageDraw.Draw(image)
+    draw.ellipse(bounding_box(radius_outer_black), fill="black")
+
+    # Segments are measured clockwise from the top, Pillow angles clockwise
+    # from the positive x axis
     angle_per_segment = 360 / bits
-    for i in range(bits):
-        if (1 << (bits - 1 - i)) & code:
-            start_angle = i * angle_per_segment
-            end_angle = (i + 1) * angle_per_segment
+    for i in _set_segments(code, bits):
+        draw.pieslice(
+            bounding_box(radius_outer),
+            start=i * angle_per_segment - 90,
+            end=(i + 1) * angle_per_segment - 90,
+            fill="white",
+        )
+
+    draw.ellipse(bounding_box(radius_outer_white), fill="white")
+    draw.ellipse(bounding_box(radius_inner_black), fill="black")
+    draw.ellipse(bounding_box(radius_inner_dot), fill="white")
+    image.save(filename, compress_level=1)
+
+
+def _magick_target_args(center, radii):
+    # The ImageMagick arguments shared by every target, split around where
+    # the arc segments are drawn
+    radius_outer_black, radius_outer_white, radius_inner_black, radius_inner_dot = radii
 
-            # Calculate start and end points for the outer and inner arcs
-            start_outer = angle_to_coordinates(start_angle, radius_outer, center)
-            end_outer = angle_to_coordinates(end_angle, radius_outer, center)
+    # Each circle is drawn from the center to a point on its radius
+    outer_black_circle = ["-fill", "black", "-draw", f"circle {center[0]},{center[1]} {center[0]},{center[1]+radius_outer_black}"]
+    outer_white_circle = ["-fill", "white", "-draw", f"circle {center[0]},{center[1]} {center[0]},{center[1]+radius_outer_white}"]
+    inner_black_circle = ["-fill", "black", "-draw", f"circle {center[0]},{center[1]} {center[0]},{center[1]+radius_inner_black}"]
+    inner_white_circle = ["-fill", "white", "-draw", f"circle {center[0]},{center[1]} {center[0]},{center[1]+radius_inner_dot}"]
+    prefix = ["xc:white", *outer_black_circle]
+    suffix = [*outer_white_circle, *inner_black_circle, *inner_white_circle]
+    return prefix, suffix
 
-            # Construct the arc command
-            # Note: This assumes clockwise drawing; adjust as necessary
-            command = f"-fill white -draw \"path 'M {center[0]},{center[1]} L {start_outer[0]},{start_outer[1]} A {radius_outer},{radius_outer} 0 0,1 {end_outer[0]},{end_outer[1]} Z'\""
-            commands.append(command)
 
-    return " ".join(commands)
+def _render_batch(
+    codes, bits, center, radius_outer, radii, size, output_prefix, magick_args
+):
+    # Render the targets for a batch of codes and return their filenames;
+    # kept at module level so it can be run by a ProcessPoolExecutor
+    filenames = [output_prefix + str(code) + ".png" for code in codes]
+    if Image is not None:
+        for code, filename in zip(codes, filenames):
+            draw_target(code, bits, center, radius_outer, radii, size, filename)
+        return filenames
+
+    # Draw every target in the batch with one magick process. Each target but
+    # the last is drawn in its own image sequence that is written out and
+    # discarded; the last one is left as the only image and written as the
+    # command's regular output
+    prefix, suffix = magick_args
+    width, height = size
+    command = ["magick", "-size", f"{width}x{height}"]
+    for code, filename in zip(codes[:-1], filenames[:-1]):
+        arc_commands = generate_arc_commands(code, bits, center, radius_outer)
+        command += ["(", *prefix, *arc_commands, *suffix]
+        command += ["-write", filename, "+delete", ")"]
+    arc_commands = generate_arc_commands(codes[-1], bits, center, radius_outer)
+    command += [*prefix, *arc_commands, *suffix, filenames[-1]]
+    subprocess.run(command, check=True)
+    return filenames
 
 
 @click.command()
@@ -232,8 +533,10 @@ def generate_targets(
         click.echo(f"Error creating output directory: {e}")
         return
 
-    if not shutil.which("magick"):
-        click.echo("Error: ImageMagick is not installed or not in the system's PATH.")
+    if Image is None and not shutil.which("magick"):
+        click.echo(
+            "Error: Neither Pillow nor ImageMagick (in the system's PATH) is installed."
+        )
         return
 
     if bits <= 0 or bits % 2 != 0:
@@ -243,33 +546,51 @@ def generate_targets(
     codes = generate_codes(bits, transitions, max_codes)
     click.echo(codes)
 
-    for code in codes:
-        # Example usage within your existing function, assuming center is the middle of your canvas
-        # Example center and radii, adjust as necessary
-        center = (width / 2, height / 2)
-        radius_outer = (
-            radius_outer_black + 2
-        )  # Example outer radius, adjust based on your needs
-
-        bits = 12
-        arc_commands = generate_arc_commands(
-            code, bits, center, radius_outer
-        )
-
-        filename = f"{output_dir}/{code}.png"
-        # Construct the ImageMagick command here using the provided radii and other parameters
-        # This is a placeholder for how you might start constructing the command
-        outer_black_circle = f'-fill black -draw "circle {center[0]},{center[1]} {center[0]},{center[1]+radius_outer_black}"'
-        outer_white_circle = f'-fill white -draw "circle {center[0]},{center[1]} {center[0]},{center[1]+radius_outer_white}"'
-        inner_black_circle = f'-fill black -draw "circle {center[0]},{center[1]} {center[0]},{center[1]+radius_inner_black}"'
-        inner_white_circle = f'-fill white -draw "circle {center[0]},{center[1]} {center[0]},{center[1]+radius_inner_dot}"'
-        command = f"magick -size {width}x{height} xc:white {outer_black_circle} {arc_commands} {outer_white_circle} {inner_black_circle} {inner_white_circle} {filename}"
-        # Add more parameters to the command based on the radii and the code
-        # click.echo(command)
-
-        # Execute the command
-        subprocess.run(command, shell=True)
-        click.echo(f"Generated {filename}")
+    # Example center and radii, adjust as necessary
+    center = (width / 2, height / 2)
+    radius_outer = (
+        radius_outer_black + 2
+    )  # Example outer radius, adjust based on your needs
+    radii = (radius_outer_black, radius_outer_white, radius_inner_black, radius_inner_dot)
+
+    # The circles are the same for every target, so only build their
+    # ImageMagick arguments once
+    magick_args = None
+    batch_size = 1
+    if Image is None:
+        magick_args = _magick_target_args(center, radii)
+        batch_size = _MAGICK_BATCH_SIZE
+
+    # Output directory with a trailing separator, so each filename is a plain
+    # concatenation
+    output_prefix = os.path.join(output_dir, "")
+
+    # Each target writes an independent file, so render them in parallel,
+    # bounded by the number of CPUs
+    with ProcessPoolExecutor() as executor:
+        futures = [
+            executor.submit(
+                _render_batch,
+                codes[start : start + batch_size],
+                bits,
+                center,
+                radius_outer,
+                radii,
+                (width, height),
+                output_prefix,
+                magick_args,
+            )
+            for start in range(0, len(codes), batch_size)
+        ]
+        try:
+            for future in as_completed(futures):
+                for filename in future.result():
+                    click.echo(f"Generated {filename}")
+        except subprocess.CalledProcessError as e:
+            click.echo(f"Error running ImageMagick: {e}")
+            for future in futures:
+                future.cancel()
+            return
 
 
 if __name__ == "__main__":